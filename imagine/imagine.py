@@ -14,24 +14,29 @@
 # limitations under the License.
 import os
 import re
+import shutil
+import struct
 import numpy
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import chain, islice
 from PIL import Image
+from multiprocessing import get_start_method
 from multiprocessing.pool import Pool
-try:
-    from mxnet.recordio import IRHeader, MXIndexedRecordIO, pack
-except ImportError:
-    IRHeader = None
 from time import perf_counter
-from typing import Generator, List, NoReturn, Optional, Tuple
-from math import ceil
+from typing import (Any,
+                    Callable,
+                    Dict,
+                    Generator,
+                    Iterable,
+                    List,
+                    NoReturn,
+                    Optional,
+                    Pattern,
+                    Tuple)
 try:
     from tensorflow.io import TFRecordWriter
-    from tensorflow.train import (BytesList,
-                                  Example,
-                                  Feature,
-                                  Features,
-                                  Int64List)
 except ImportError:
     TFRecordWriter = None
 
@@ -41,6 +46,38 @@ TFRECORD = 'create-tfrecord'
 RECORDIO = 'create-recordio'
 SUPPORTED_IMAGE_FORMATS = {"jpg": "jpg", "jpeg": "jpg", "bmp": "bmp",
                            "bitmap": "bmp", "png": "png"}
+# Matches a run of digits, used as a fallback to find image counters.
+DIGITS_REGEX = re.compile(r'\d+')
+# Serialized ``Features.feature`` map entry of a ``tf.train.Example`` holding
+# the constant 'image/class/label' feature with an Int64List value of [0].
+TFRECORD_LABEL_ENTRY = (b'\n\x1a\n\x11image/class/label'
+                        b'\x12\x05\x1a\x03\n\x01\x00')
+# Magic number which starts every part of a record in a RecordIO file.
+RECORDIO_MAGIC = 0xced7230a
+# Header of each part of a RecordIO record: the magic number followed by the
+# continuation flag in the upper 3 bits and the part length in the lower 29.
+RECORDIO_PART_HEADER = struct.Struct('<II')
+# Records must fit in the 29 bits of the part length, matching MXNet's limit.
+RECORDIO_MAX_LENGTH = 1 << 29
+# MXNet ``IRHeader`` of flag, label, id, and id2 which precedes every image.
+RECORDIO_IMAGE_HEADER = struct.Struct('<IfQQ')
+# Compression types supported by ``TFRecordWriter`` for each CLI choice.
+TFRECORD_COMPRESSION = {"none": "", "gzip": "GZIP", "zlib": "ZLIB"}
+# Approximate number of images a worker process creates before it is replaced,
+# which returns memory fragmented by numpy and the image encoders during long
+# runs. Only used when workers are forked, as a spawned replacement imports
+# this module and TensorFlow again.
+MAX_IMAGES_PER_CHILD = 256
+# Encoder options passed to Pillow for each file extension. Random pixel data
+# is incompressible, so the fastest zlib level gives nearly the same PNG size.
+SAVE_OPTIONS = {"png": {"compress_level": 1}}
+# Number of leading bytes in a synthetic image which are unique per image.
+SYNTHETIC_SALT_SIZE = 64
+
+# Settings shared by every image in a run, set in each worker process.
+_image_settings = None
+# Random image shared by all synthetic images, set in each worker process.
+_synthetic_tile = None
 
 
 def _parse_args() -> Namespace:
@@ -78,8 +115,14 @@ def _parse_args() -> Namespace:
     commands_parent.add_argument('name', help='Name to prepend files with, '
                                  'such as "sample_record_"')
     commands_parent.add_argument('--img-per-file', type=int, default=1000)
-    commands.add_parser(TFRECORD, help='Create TFRecords from input images',
-                        parents=[commands_parent])
+    commands_parent.add_argument('--workers', help='The number of workers to '
+                                 'use. Defaults to the number of CPUs '
+                                 'available to the process', type=int)
+    tfrecord = commands.add_parser(TFRECORD, help='Create TFRecords from '
+                                   'input images', parents=[commands_parent])
+    tfrecord.add_argument('--compression', help='The compression to apply to '
+                          'the TFRecord files', default='none',
+                          choices=TFRECORD_COMPRESSION.keys())
     commands.add_parser(RECORDIO, help='Create RecordIO from input images',
                         parents=[commands_parent])
 
@@ -103,6 +146,20 @@ def _parse_args() -> Namespace:
     standard.add_argument('--size', help='Display the first image size and '
                           'the directory size for the images',
                           action='store_true')
+    standard.add_argument('--fast-synth', help='Generate a single random '
+                          'image and derive every file from it by changing a '
+                          'small salt per image. Much faster, but the images '
+                          'are nearly identical', action='store_true')
+    standard.add_argument('--identical', help='Generate a single random '
+                          'image and hard link every other file to it. '
+                          'Fastest, but all images are identical',
+                          action='store_true')
+    standard.add_argument('--chunksize', help='The number of images to send '
+                          'to a worker process at a time. Defaults to roughly '
+                          'four chunks per worker', type=int)
+    standard.add_argument('--workers', help='The number of worker processes '
+                          'to use. Defaults to the number of CPUs available '
+                          'to the process', type=int)
     return parser.parse_args()
 
 
@@ -143,6 +200,32 @@ def _check_directory_exists(directory: str) -> NoReturn:
                            'contains valid images.')
 
 
+def _worker_count(workers: Optional[int] = None) -> int:
+    """
+    Determine the number of worker processes to use.
+
+    If a positive number of workers is requested, it is used as-is. Otherwise,
+    the number of CPUs the current process is allowed to run on is used, which
+    can be lower than the total CPU count when running in a container or with
+    a restricted CPU affinity.
+
+    Parameters
+    ----------
+    workers : int (optional)
+        The requested number of worker processes.
+
+    Returns
+    -------
+    int
+        Returns an ``int`` of the number of worker processes to use.
+    """
+    if workers and workers > 0:
+        return workers
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
 def create_images(
     path: str,
     name: str,
@@ -152,7 +235,10 @@ def create_images(
     image_format: str,
     seed: Optional[int] = 0,
     size: Optional[bool] = False,
-    chunksize: Optional[int] = 64
+    chunksize: Optional[int] = None,
+    fast_synth: Optional[bool] = False,
+    workers: Optional[int] = None,
+    identical: Optional[bool] = False
 ) -> NoReturn:
     """
     Randomly generate standard images.
@@ -190,29 +276,83 @@ def create_images(
     chunksize : int (optional)
         Specify the number of chunks to divide the requested amount of images
         into. Higher chunksizes reduce the amount of memory consumed with minor
-        additional overhead.
-    """.format(SUPPORTED_IMAGE_FORMATS.keys())
+        additional overhead. Defaults to giving each worker process roughly
+        four chunks of images.
+    fast_synth : bool (optional)
+        If `True`, a single random image is generated up front and every file
+        is a copy of it with the first {} bytes of pixel data replaced by a
+        per-image salt. This skips nearly all random number generation, which
+        is useful when only the file sizes and counts matter for a benchmark.
+    workers : int (optional)
+        The number of worker processes to generate images with. Defaults to
+        the number of CPUs available to the process.
+    identical : bool (optional)
+        If `True`, only the first image is generated and every other file is a
+        hard link to it, or a copy where hard links aren't supported. All files
+        have identical contents, which is useful when only the number of files
+        matters for a benchmark.
+    """.format(SUPPORTED_IMAGE_FORMATS.keys(), SYNTHETIC_SALT_SIZE)
     print('Creating {} {} files located at {} of {}x{} resolution with a base '
           'base filename of {}'.format(count, image_format, path, width,
                                        height, name))
     _try_create_directory(path)
     combined_path = os.path.join(path, name)
+    file_ext = SUPPORTED_IMAGE_FORMATS.get(image_format.lower(), 'png')
 
-    # Expected to yield a thread pool equivalent to the number of CPU cores in
-    # the system.
-    pool = Pool()
-    try:
-        start_time = perf_counter()
-        # NOTE: For very large image counts on memory-constrained systems, this
-        # can stall-out. Either reduce the image count request, or increase the
-        # chunk size.
-        pool.starmap(_image_creation,
-                     ((combined_path, width, height, seed, image_format, n)
-                      for n in range(count)),
-                     chunksize=chunksize)
-    finally:
-        pool.close()
-        pool.join()
+    start_time = perf_counter()
+    tile = None
+    if fast_synth:
+        # The tile needs its own stream as the salt for each image is drawn
+        # from ``default_rng(seed + n)``. Seeding the tile with `seed` would
+        # make the salt of the first image equal its leading bytes, zeroing
+        # them when XORed together.
+        tile_seed, = numpy.random.SeedSequence(seed).spawn(1)
+        rng = numpy.random.default_rng(tile_seed)
+        tile = _random_pixels(rng, width, height)
+    settings = (combined_path, width, height, seed, file_ext)
+
+    processes = _worker_count(workers)
+    if not chunksize:
+        # A few chunks per worker keeps every worker busy until the end of the
+        # run without dispatching each image as a separate task.
+        chunksize = max(1, count // (processes * 4))
+    if identical and count > 1:
+        # Only the first image is generated and every other file links to it,
+        # which skips encoding entirely.
+        _create_image(settings, tile, 0)
+        first_image = f'{combined_path}0.{file_ext}'
+        for n in range(1, count):
+            _link_image(first_image, f'{combined_path}{n}.{file_ext}')
+    elif count <= 1:
+        # Starting the worker processes takes longer than creating a single
+        # image, so it is created in this process instead.
+        for n in range(count):
+            _create_image(settings, tile, n)
+    else:
+        print('Using {} worker processes'.format(processes))
+        # The pool counts each chunk of images as a single task, so workers
+        # are replaced after the number of chunks closest to the image limit.
+        # Chunks larger than the limit replace the worker after every chunk.
+        # Replacing a spawned worker costs far more than the memory it frees,
+        # so workers are kept for the whole run unless they are forked.
+        max_tasks = None
+        if get_start_method() == 'fork':
+            max_tasks = max(1, MAX_IMAGES_PER_CHILD // chunksize)
+        # Only the image counter changes between tasks, so the remaining
+        # settings and the synthetic tile are sent to each worker once when
+        # the pool starts instead of being pickled with every task.
+        pool = Pool(processes, initializer=_init_image_worker,
+                    initargs=settings + (tile,), maxtasksperchild=max_tasks)
+        try:
+            # NOTE: For very large image counts on memory-constrained systems,
+            # this can stall-out. Either reduce the image count request, or
+            # increase the chunk size.
+            for _ in pool.imap_unordered(_image_creation, range(count),
+                                         chunksize=chunksize):
+                pass
+        finally:
+            pool.close()
+            pool.join()
 
     stop_time = perf_counter()
 
@@ -226,19 +366,20 @@ def _record_slice(
     source_path: str,
     dest_path: str,
     name: str,
-    image_files: List[str],
-    images_per_file: int,
-    num_of_records: int
+    image_files: Iterable[str],
+    images_per_file: int
 ) -> Generator[Tuple[str, str, str, List[str], int], None, None]:
     """
     Generate subcomponents for a thread.
 
-    While creating RecordIO files, a tuple needs to be generated to pass to
+    While creating record files, a tuple needs to be generated to pass to
     every thread in a multiprocessing pool. Each tuple corresponds with a
     unique record file with a new path, name, and subset of images. The subset
-    of images is calculated by taking the first N-images where
-    N = (total images) / (number of records). The next subset begins at N + 1
-    and so on.
+    of images is calculated by taking the next N-images from `image_files`
+    where N is the number of images per record file, until all images have
+    been used. Only a single subset is held in memory at a time, so
+    `image_files` can be a lazy iterator over a very large directory, such as
+    the one returned by ``_list_images``.
 
     Parameters
     ----------
@@ -251,14 +392,11 @@ def _record_slice(
         A ``string`` to prepend to all filenames, such as `random_record_`.
         Filenames will end with a counter starting at zero, followed by the
         file format's extension.
-    image_files : list
-        A ``list`` of ``strings`` of the image filenames to use for the record
-        files.
+    image_files : iterable
+        An iterable of ``strings`` of the image filenames to use for the
+        record files.
     images_per_file : int
         The number of images to include per record file.
-    num_of_records : int
-        The total number of record files to create. Note that one record
-        assumes a record file plus a corresponding index file.
 
     Returns
     -------
@@ -269,20 +407,45 @@ def _record_slice(
         `image_files` as a ``list`` of ``strings``, and a counter for the
         record file starting at 0 as an ``int``.
     """
-    for num in range(num_of_records):
-        subset = num * images_per_file
-        yield (source_path,
-               dest_path,
-               name,
-               image_files[subset:(subset + images_per_file)],
-               num)
+    image_files = iter(image_files)
+    num = 0
+    subset = list(islice(image_files, images_per_file))
+    while subset:
+        yield (source_path, dest_path, name, subset, num)
+        num += 1
+        subset = list(islice(image_files, images_per_file))
+
+
+def _unpack_arguments(function: Callable, arguments: Tuple) -> Any:
+    """
+    Call a function with a tuple of arguments.
+
+    ``Pool.imap_unordered`` only passes a single argument to the function,
+    unlike ``Pool.starmap`` which eagerly converts its whole input into a
+    list. Binding the target function to this helper allows tuples of
+    arguments to be consumed lazily.
+
+    Parameters
+    ----------
+    function : callable
+        The function to call.
+    arguments : tuple
+        The positional arguments to pass to `function`.
+
+    Returns
+    -------
+    Any
+        Returns the result of the function call.
+    """
+    return function(*arguments)
 
 
 def create_recordio(
     source_path: str,
     dest_path: str,
     name: str,
-    img_per_file: int
+    img_per_file: int,
+    workers: Optional[int] = None
 ) -> NoReturn:
     """
     Create RecordIO files based on standard images.
@@ -309,43 +472,62 @@ def create_recordio(
         file format's extension.
     images_per_file : int
         The number of images to include per record file.
+    workers : int (optional)
+        The number of worker threads to create record files with. Defaults to
+        the number of CPUs available to the process.
     """
     print('Creating RecordIO files at {} from {} targeting {} files per '
           'record with a base filename of {}'.format(dest_path,
                                                      source_path,
                                                      img_per_file,
                                                      name))
-    if not IRHeader:
-        raise ImportError('MXNet not found! Please install MXNet dependency '
-                          'using "pip install nvidia-imageinary[\'mxnet\']".')
-    image_files = []
     source_path = os.path.abspath(source_path)
     dest_path = os.path.abspath(dest_path)
     _check_directory_exists(source_path)
     _try_create_directory(dest_path)
 
-    _print_image_information(source_path)
-
-    for image_name in os.listdir(source_path):
-        if not os.path.isdir(os.path.join(source_path, image_name)):
-            image_files.append(image_name)
+    # The directory is streamed into the records and the image sizes are
+    # totalled along the way, so it is only read once and never held in
+    # memory as a whole. The size information is printed once it is complete.
+    sizes = {}
+    exclude = _record_file_pattern(source_path, dest_path, name,
+                                   r'\.(idx|rec)')
+    image_files = _list_images(source_path, sizes, exclude)
 
-    num_of_records = ceil(len(image_files) / img_per_file)
-    pool = Pool()
-    try:
-        start_time = perf_counter()
-        pool.starmap(_recordio_creation,
-                     _record_slice(source_path,
-                                   dest_path,
-                                   name,
-                                   image_files,
-                                   img_per_file,
-                                   num_of_records))
-    finally:
-        pool.close()
-        pool.join()
+    record_creation = partial(_unpack_arguments, _recordio_creation)
+    start_time = perf_counter()
+    record_slices = _record_slice(source_path, dest_path, name, image_files,
+                                  img_per_file)
+    first_slices = list(islice(record_slices, 2))
+    if len(first_slices) <= 1:
+        # A single record file is created directly without starting any
+        # worker threads.
+        for record_slice in first_slices:
+            record_creation(record_slice)
+    else:
+        # Creating RecordIO files is bound by file I/O which releases the GIL,
+        # so threads are used to avoid starting worker processes and pickling
+        # the image names for each record file.
+        threads = _worker_count(workers)
+        print('Using {} worker threads'.format(threads))
+        record_slices = chain(first_slices, record_slices)
+        with ThreadPoolExecutor(threads) as executor:
+            # ``Executor.map`` submits every record file up front, so only a
+            # couple of record files per thread are queued at a time to keep
+            # the directory listing lazy.
+            pending = set()
+            for record_slice in record_slices:
+                if len(pending) >= threads * 2:
+                    done, pending = wait(pending,
+                                         return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(record_creation, record_slice))
+            for future in pending:
+                future.result()
 
     stop_time = perf_counter()
+    _print_image_information(source_path, sizes)
     print('Completed in {} seconds'.format(stop_time-start_time))
 
 
@@ -353,7 +535,9 @@ def create_tfrecords(
     source_path: str,
     dest_path: str,
     name: str,
-    img_per_file: int
+    img_per_file: int,
+    workers: Optional[int] = None,
+    compression: Optional[str] = 'none'
 ) -> NoReturn:
     """
     Create TFRecords based on standard images.
@@ -379,6 +563,19 @@ def create_tfrecords(
         Filenames will end with a counter starting at zero.
     images_per_file : int
         The number of images to include per record file.
+    workers : int (optional)
+        The number of worker processes to create record files with. Defaults
+        to the number of CPUs available to the process.
+    compression : string (optional)
+        The compression to apply to the record files. Choices are: 'none',
+        'gzip', and 'zlib'. Defaults to no compression, which is also used
+        when `None` is passed. Random images are already incompressible, so
+        compression is mainly useful for real images.
+
+    Raises
+    ------
+    ValueError
+        Raises a ``ValueError`` if the requested compression isn't supported.
     """
     print('Creating TFRecord files at {} from {} targeting {} files per '
           'TFRecord with a base filename of {}'.format(dest_path,
@@ -389,45 +586,184 @@ def create_tfrecords(
         raise ImportError('TensorFlow not found! Please install TensorFlow '
                           'dependency using "pip install '
                           'nvidia-imageinary[\'tfrecord\']".')
+    compression = (compression or 'none').lower()
+    if compression not in TFRECORD_COMPRESSION:
+        raise ValueError('Error: Unsupported TFRecord compression {}. Choices '
+                         'are: {}'.format(compression,
+                                          list(TFRECORD_COMPRESSION.keys())))
+    compression_type = TFRECORD_COMPRESSION[compression]
     _check_directory_exists(source_path)
     _try_create_directory(dest_path)
-    combined_path = os.path.join(dest_path, name)
 
-    _print_image_information(source_path)
-
-    image_count = 0
-    record = 0
+    # The directory is streamed into the records and the image sizes are
+    # totalled along the way, so it is only read once and never held in
+    # memory as a whole. The size information is printed once it is complete.
+    sizes = {}
+    exclude = _record_file_pattern(source_path, dest_path, name)
+    image_files = _list_images(source_path, sizes, exclude)
 
+    tfrecord_creation = partial(_tfrecord_creation,
+                                compression_type=compression_type)
+    record_creation = partial(_unpack_arguments, tfrecord_creation)
     start_time = perf_counter()
-    writer = TFRecordWriter(combined_path + str(record))
-    for image_name in os.listdir(source_path):
-        image_path = os.path.join(source_path, image_name)
-        if os.path.isdir(image_path):
-            continue
-        image_count += 1
-        if image_count > img_per_file:
-            image_count = 1
-            writer.close()
-            record += 1
-            writer = TFRecordWriter(combined_path + str(record))
-
-        with open(image_path, 'rb') as image_file:
-            image = image_file.read()
-        feature = {
-            'image/encoded': Feature(bytes_list=BytesList(value=[image])),
-            'image/class/label': Feature(int64_list=Int64List(value=[0]))
-        }
-
-        tfrecord_entry = Example(features=Features(feature=feature))
-        writer.write(tfrecord_entry.SerializeToString())
+    record_slices = _record_slice(source_path, dest_path, name, image_files,
+                                  img_per_file)
+    first_slices = list(islice(record_slices, 2))
+    if len(first_slices) <= 1:
+        # Starting the worker processes takes longer than creating a single
+        # record file, so it is created in this process instead.
+        for record_slice in first_slices:
+            record_creation(record_slice)
+    else:
+        processes = _worker_count(workers)
+        print('Using {} worker processes'.format(processes))
+        record_slices = chain(first_slices, record_slices)
+        pool = Pool(processes)
+        try:
+            for _ in pool.imap_unordered(record_creation, record_slices):
+                pass
+        finally:
+            pool.close()
+            pool.join()
 
-    writer.close()
     stop_time = perf_counter()
-
+    _print_image_information(source_path, sizes)
     print('Completed in {} seconds'.format(stop_time-start_time))
 
 
-def _print_image_information(path: str) -> NoReturn:
+def _read_image(image_path: str) -> bytes:
+    """
+    Read the contents of an image file.
+
+    The file is usually read with a single system call into a ``bytes``
+    object, skipping the buffered file object Python would otherwise wrap
+    around the file descriptor. Where supported, the kernel is told the file
+    will be read sequentially so it can use a larger readahead.
+
+    Parameters
+    ----------
+    image_path : string
+        The path to the image file to read.
+
+    Returns
+    -------
+    bytes
+        Returns the raw contents of the image file.
+
+    Raises
+    ------
+    OSError
+        Raises an ``OSError`` if the file ends before its full size is read.
+    """
+    fd = os.open(image_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        size = os.fstat(fd).st_size
+        data = os.read(fd, size)
+        if len(data) == size:
+            return data
+        # A read can return fewer bytes than requested, such as on network or
+        # FUSE filesystems and above 2 GiB on Linux, so the rest of the file
+        # is read until its full size has arrived.
+        parts = [data]
+        remaining = size - len(data)
+        while remaining:
+            data = os.read(fd, remaining)
+            if not data:
+                raise OSError('Error: Image {} ended after {} of {} bytes.'
+                              .format(image_path, size - remaining, size))
+            parts.append(data)
+            remaining -= len(data)
+        return b''.join(parts)
+    finally:
+        os.close(fd)
+
+
+def _record_file_pattern(
+    source_path: str,
+    dest_path: str,
+    name: str,
+    extension: str = ''
+) -> Optional[Pattern]:
+    """
+    Match the record files written into the source directory.
+
+    The source directory is still being listed while the records are written,
+    so any records saved into the same directory would otherwise be read back
+    in as images.
+
+    Parameters
+    ----------
+    source_path : string
+        Path to the directory where the input images are stored.
+    dest_path : string
+        Path to the directory where the record files are saved.
+    name : string
+        The ``string`` the record filenames are prepended with.
+    extension : string (optional)
+        A regular expression matching the extensions of the record files, if
+        any.
+
+    Returns
+    -------
+    Pattern
+        Returns a compiled regular expression which fully matches the record
+        filenames, or `None` if the records are saved to another directory.
+    """
+    if not os.path.samefile(source_path, dest_path):
+        return None
+    return re.compile(re.escape(name) + r'\d+' + extension)
+
+
+def _list_images(
+    path: str,
+    sizes: Optional[Dict[str, int]] = None,
+    exclude: Optional[Pattern] = None
+) -> Generator[str, None, None]:
+    """
+    List the images in a directory.
+
+    The directory is read lazily with scandir, so only a small batch of
+    entries is held in memory at a time. The entries cache the file type, so
+    checking for directories doesn't require an extra stat call for every
+    file.
+
+    Parameters
+    ----------
+    path : string
+        The path to the directory where the images are stored.
+    sizes : dict (optional)
+        A ``dictionary`` to total the image sizes in while the directory is
+        read. The size of the first image is stored under 'first' and the
+        total size of all images under 'total', both in bytes.
+    exclude : Pattern (optional)
+        A compiled regular expression of filenames to skip, such as the
+        pattern returned by ``_record_file_pattern``.
+
+    Returns
+    -------
+    Generator
+        Yields the filename of every file in the directory which isn't a
+        directory itself or excluded as a ``string``.
+    """
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                continue
+            if exclude and exclude.fullmatch(entry.name):
+                continue
+            if sizes is not None:
+                size = entry.stat().st_size
+                sizes.setdefault('first', size)
+                sizes['total'] = sizes.get('total', 0) + size
+            yield entry.name
+
+
+def _print_image_information(
+    path: str,
+    sizes: Optional[Dict[str, int]] = None
+) -> NoReturn:
     """
     Print the image and directory size.
 
@@ -439,23 +775,47 @@ def _print_image_information(path: str) -> NoReturn:
     ----------
     path : string
         The path to the directory where generated images are stored.
+    sizes : dict (optional)
+        A ``dictionary`` of image sizes already totalled by ``_list_images``.
+        Passing it avoids reading the directory again. If omitted, the
+        directory is listed.
     """
-    is_first_image = True
-    first_image_size = 0
-    directory_size = 0
-    for image_name in os.listdir(path):
-        image_path = os.path.join(path, image_name)
-        if os.path.isdir(image_path):
-            continue
-        directory_size += os.path.getsize(image_path)
-        if is_first_image:
-            first_image_size = directory_size
-            is_first_image = False
+    if sizes is None:
+        sizes = {}
+        for _ in _list_images(path, sizes):
+            pass
+
+    first_image_size = sizes.get('first', 0)
+    directory_size = sizes.get('total', 0)
     print('First image size from {}, in bytes: {}'.format(path,
                                                           first_image_size))
     print('Directory {} size, in bytes: {}'.format(path, directory_size))
 
 
+def _link_image(source: str, destination: str) -> NoReturn:
+    """
+    Link an image to a new filename.
+
+    Create a hard link to an existing image so the new file shares the same
+    data without writing it again. Any existing file at the destination is
+    replaced. If hard links aren't supported, such as on some network
+    filesystems, the image is copied instead.
+
+    Parameters
+    ----------
+    source : string
+        The path to the existing image.
+    destination : string
+        The path to the new image.
+    """
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
 def _recordio_creation(
     source_path: str,
     dest_path: str,
@@ -486,65 +846,416 @@ def _recordio_creation(
         at zero.
     """
     combined_path = os.path.join(dest_path, name)
-    regex = re.compile(r'\d+')
-    dataset_rec = combined_path + str(n) + '.rec'
-    dataset_idx = combined_path + str(n) + '.idx'
-    recordio_ds = MXIndexedRecordIO(os.path.join(dest_path, dataset_idx),
-                                    os.path.join(dest_path, dataset_rec),
-                                    'w')
+    dataset_rec = f'{combined_path}{n}.rec'
+    dataset_idx = f'{combined_path}{n}.idx'
+    position = 0
+
+    with open(dataset_rec, 'wb') as record_file, \
+            open(dataset_idx, 'w') as index_file:
+        for image_name in image_files:
+            image_path = os.path.join(source_path, image_name)
+            image_index = _image_index(image_name)
+            header = RECORDIO_IMAGE_HEADER.pack(0, 0, image_index, 0)
+            record = _recordio_record(header + _read_image(image_path))
+            record_file.write(record)
+            # The index maps each image to the offset of its record.
+            index_file.write('{}\t{}\n'.format(image_index, position))
+            position += len(record)
+
+
+def _recordio_record(payload: bytes) -> bytes:
+    """
+    Encode a record in the RecordIO format.
+
+    Produces the same bytes as MXNet's RecordIO writer. Every record begins
+    with the RecordIO magic number, so the magic number can't appear in the
+    data at a 4-byte aligned offset. Instead, the payload is split into parts
+    wherever it does, with the magic number implied by the header of the next
+    part. The record is padded with zeros to a multiple of 4 bytes.
+
+    Parameters
+    ----------
+    payload : bytes
+        The ``bytes`` to store in the record, such as an ``IRHeader`` followed
+        by an encoded image.
+
+    Returns
+    -------
+    bytes
+        Returns the encoded record as ``bytes``.
+
+    Raises
+    ------
+    ValueError
+        Raises a ``ValueError`` if the payload is too large to be stored in a
+        single record.
+    """
+    length = len(payload)
+    if length >= RECORDIO_MAX_LENGTH:
+        raise ValueError('Error: RecordIO records must be smaller than {} '
+                         'bytes, got {} bytes.'.format(RECORDIO_MAX_LENGTH,
+                                                       length))
+    words = numpy.frombuffer(payload, dtype='<u4', count=length // 4)
+    splits = (numpy.flatnonzero(words == RECORDIO_MAGIC) * 4).tolist()
+    data = memoryview(payload)
+    parts = []
+    start = 0
+
+    for split in splits:
+        # The first part of a split record is flagged with 1, and any
+        # following parts except for the last with 2.
+        cflag = 1 if start == 0 else 2
+        parts.append(RECORDIO_PART_HEADER.pack(RECORDIO_MAGIC,
+                                               cflag << 29 | split - start))
+        parts.append(data[start:split])
+        start = split + 4
+
+    # A complete record is flagged with 0 and the last part of a split record
+    # with 3.
+    cflag = 3 if splits else 0
+    parts.append(RECORDIO_PART_HEADER.pack(RECORDIO_MAGIC,
+                                           cflag << 29 | length - start))
+    parts.append(data[start:])
+    parts.append(bytes(-length % 4))
+    return b''.join(parts)
+
+
+def _image_index(image_name: str) -> int:
+    """
+    Find the image counter in an image filename.
+
+    Images created by Imageinary are named with the requested prefix followed
+    by the image counter and the file extension, so the counter is the run of
+    digits at the end of the filename once the extension is removed. Those
+    digits are found with a single ``rstrip`` instead of a regular expression.
+    Filenames which don't end with a number fall back to the first number
+    found anywhere in the filename.
+
+    Parameters
+    ----------
+    image_name : string
+        The filename of the image, without the directory.
+
+    Returns
+    -------
+    int
+        Returns the image counter parsed from the filename.
+    """
+    stem = os.path.splitext(image_name)[0]
+    prefix = stem.rstrip('0123456789')
+    if len(prefix) < len(stem):
+        return int(stem[len(prefix):])
+    return int(DIGITS_REGEX.search(image_name).group())
+
+
+def _tfrecord_creation(
+    source_path: str,
+    dest_path: str,
+    name: str,
+    image_files: List[str],
+    n: int,
+    compression_type: Optional[str] = ''
+) -> NoReturn:
+    """
+    Create a TFRecord file based on input images.
+
+    Given a subset of images, a TFRecord file should be created with the given
+    name and counter. Each record file is independent, allowing multiple
+    files to be written in parallel.
+
+    Parameters
+    ----------
+    source_path : string
+        Path to the directory where the input images are stored.
+    dest_path : string
+        Path to the directory where the record files should be saved. Will be
+        created if it does not exist.
+    name : string
+        A ``string`` to prepend the record filename with.
+    image_files : list
+        A ``list`` of ``strings`` of image filenames to be used for the record
+        creation.
+    n : int
+        An ``integer`` of the current count the record file points to, starting
+        at zero.
+    compression_type : string (optional)
+        The compression type to pass to ``TFRecordWriter``, either 'GZIP',
+        'ZLIB', or an empty ``string`` for no compression.
+    """
+    combined_path = os.path.join(dest_path, name)
+    writer = TFRecordWriter(f'{combined_path}{n}', compression_type)
 
     for image_name in image_files:
-        image_path = os.path.join(source_path, image_name)
-        image_index = int(regex.findall(image_name)[0])
-        header = IRHeader(0, 0, image_index, 0)
-        image = open(image_path, "rb").read()
-        packed_image = pack(header, image)
-        recordio_ds.write_idx(image_index, packed_image)
+        image = _read_image(os.path.join(source_path, image_name))
+        writer.write(_tfrecord_example(image))
+
+    writer.close()
+
+
+def _varint(value: int) -> bytes:
+    """
+    Encode a non-negative integer as a protobuf varint.
+
+    Parameters
+    ----------
+    value : int
+        The non-negative integer to encode.
+
+    Returns
+    -------
+    bytes
+        Returns the integer encoded 7 bits at a time, least significant group
+        first, with the high bit set on every byte except the last.
+    """
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
 
-    recordio_ds.close()
+def _tfrecord_example(image: bytes) -> bytes:
+    """
+    Serialize an image as a ``tf.train.Example``.
+
+    Every record uses the same two features, 'image/encoded' holding the image
+    and 'image/class/label' holding a constant label of 0, so the protobuf wire
+    format is written directly instead of building and serializing the
+    ``Example``, ``Features``, ``Feature`` and ``BytesList`` messages for every
+    image. Each nested message is written as field 1 with its length as a
+    varint prefix, except for the map entry value which is field 2.
 
+    Parameters
+    ----------
+    image : bytes
+        The encoded image to store in the 'image/encoded' feature.
 
-def _image_creation(
+    Returns
+    -------
+    bytes
+        Returns the serialized ``Example``. It parses to an ``Example`` equal
+        to one built from the same features, though the bytes may differ from
+        ``Example.SerializeToString`` as protobuf does not fix the order of
+        map entries.
+    """
+    bytes_list = b'\n' + _varint(len(image))
+    bytes_list_size = len(bytes_list) + len(image)
+    feature = b'\n' + _varint(bytes_list_size)
+    feature_size = len(feature) + bytes_list_size
+    entry = b'\n\x0dimage/encoded\x12' + _varint(feature_size)
+    entry_size = len(entry) + feature_size
+    features = b'\n' + _varint(entry_size)
+    features_size = len(features) + entry_size + len(TFRECORD_LABEL_ENTRY)
+    return b''.join((b'\n', _varint(features_size), features, entry, feature,
+                     bytes_list, image, TFRECORD_LABEL_ENTRY))
+
+
+def _write_bmp(path: str, a: numpy.ndarray) -> NoReturn:
+    """
+    Save an RGB array as a 24-bit bitmap.
+
+    A bitmap is a fixed 54-byte header followed by the raw pixel data, stored
+    bottom-up in BGR order with every row padded to a multiple of four bytes.
+    The header is packed by hand and the pixel rows are written with a single
+    call, skipping the intermediate copies made by Pillow.
+
+    Parameters
+    ----------
+    path : string
+        The full path to the output bitmap file.
+    a : numpy.ndarray
+        A ``uint8`` array of shape `(height, width, 3)` holding the RGB pixel
+        data to save.
+    """
+    height, width, _ = a.shape
+    row_size = (width * 3 + 3) // 4 * 4
+    image_size = row_size * height
+    # BITMAPFILEHEADER followed by a BITMAPINFOHEADER for an uncompressed
+    # 24-bit image.
+    header = struct.pack('<2sIHHIIiiHHIIiiII', b'BM', 54 + image_size, 0, 0,
+                         54, 40, width, height, 1, 24, 0, image_size, 0, 0,
+                         0, 0)
+    rows = numpy.empty((height, row_size), dtype=numpy.uint8)
+    rows[:, width * 3:] = 0
+    rows[:, :width * 3].reshape(height, width, 3)[...] = a[::-1, :, ::-1]
+
+    with open(path, 'wb') as bmp_file:
+        bmp_file.write(header)
+        bmp_file.write(rows)
+
+
+def _init_image_worker(
     combined_path: str,
     width: int,
     height: int,
     seed: int,
-    image_format: str,
+    file_ext: str,
+    tile: Optional[numpy.ndarray] = None
+) -> NoReturn:
+    """
+    Store the settings shared by every image in a run.
+
+    Run once in each worker process when the pool starts so the settings only
+    need to be transferred to a worker a single time instead of with every
+    image.
+
+    Parameters
+    ----------
+    combined_path : string
+        The full path to the output image files including the requested name
+        as a prefix for the filenames.
+    width : int
+        The width of the images to generate in pixels.
+    height : int
+        The height of the images to generate in pixels.
+    seed : int
+        The seed the random data for each image is derived from.
+    file_ext : str
+        The file extension of the format the images should be saved as, as
+        resolved from ``SUPPORTED_IMAGE_FORMATS``.
+    tile : numpy.ndarray (optional)
+        A ``uint8`` array of shape `(height, width, 3)` of random pixel data
+        which every synthetic image is derived from. Only used when generating
+        synthetic images.
+    """
+    global _image_settings, _synthetic_tile
+    _image_settings = (combined_path, width, height, seed, file_ext)
+    _synthetic_tile = tile
+
+
+def _image_creation(n: int) -> NoReturn:
+    """
+    Generate an image in a worker process.
+
+    Creates the image with the settings and synthetic tile stored by
+    ``_init_image_worker`` when the worker started.
+
+    Parameters
+    ----------
+    n : int
+        The zero-based counter for the image.
+    """
+    _create_image(_image_settings, _synthetic_tile, n)
+
+
+def _create_image(
+    settings: Tuple[str, int, int, int, str],
+    tile: Optional[numpy.ndarray],
     n: int
 ) -> NoReturn:
     """
     Generate a random image.
 
-    Given a name, dimensions, a seed, and an image format, a random image is
-    generated by creating a numpy array of random data for the specified
-    dimensions and three color channels, then converting the array to an image
-    of the specified format and saving the result to the output directory with
-    the requested name postfixed with with the zero-based image counter and the
-    file extension.
+    A random image is generated by creating a numpy array of random data for
+    the requested dimensions and three color channels, then converting the
+    array to an image of the requested format and saving the result to the
+    output directory with the requested name postfixed with with the
+    zero-based image counter and the file extension.
+
+    If a synthetic tile is given, the tile is copied instead and the first
+    bytes of pixel data are XORed with a small salt which is seeded by the
+    image counter, making every file unique while skipping random number
+    generation for the rest of the image.
 
     Parameters
     ----------
-    combined_path : string
-        The full path to the output image file including the requested name as
-        a prefix for the filename.
+    settings : tuple
+        The full path to the output image files including the requested name,
+        the width and height of the image in pixels, the seed the random data
+        for each image is derived from, and the file extension to save the
+        image as.
+    tile : numpy.ndarray
+        A ``uint8`` array of shape `(height, width, 3)` of random pixel data
+        to derive a synthetic image from, or `None` to generate the whole
+        image.
+    n : int
+        The zero-based counter for the image.
+    """
+    combined_path, width, height, seed, file_ext = settings
+    rng = numpy.random.default_rng(seed + n)
+    if tile is None:
+        a = _random_pixels(rng, width, height)
+    else:
+        a = tile.copy()
+        salt = a.reshape(-1)[:SYNTHETIC_SALT_SIZE]
+        salt ^= rng.integers(0, 256, size=salt.size, dtype=numpy.uint8)
+    _save_image(combined_path, a, file_ext, n)
+
+
+def _random_pixels(
+    rng: numpy.random.Generator,
+    width: int,
+    height: int
+) -> numpy.ndarray:
+    """
+    Generate random RGB pixel data for an image.
+
+    The pixels are generated directly as ``uint8`` to avoid allocating and
+    casting an intermediate float64 array which is 8x the size of the final
+    image. Every supported format stores RGB natively, so no alpha channel is
+    generated.
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator
+        The random number generator to draw the pixel data from.
     width : int
         The width of the image to generate in pixels.
     height : int
         The height of the image to generate in pixels.
-    image_format : str
-        The format the images should be saved as.
+
+    Returns
+    -------
+    numpy.ndarray
+        Returns a ``uint8`` array of shape `(height, width, 3)`.
+    """
+    return rng.integers(0, 256, size=(height, width, 3), dtype=numpy.uint8)
+
+
+def _save_image(
+    combined_path: str,
+    a: numpy.ndarray,
+    file_ext: str,
+    n: int
+) -> NoReturn:
+    """
+    Save an array of pixel data as an image.
+
+    The array is converted to the requested format and saved to the output
+    directory with the requested name postfixed with the zero-based image
+    counter and the file extension. An existing file with the same name is
+    replaced rather than overwritten in place.
+
+    Parameters
+    ----------
+    combined_path : string
+        The full path to the output image file including the requested name as
+        a prefix for the filename.
+    a : numpy.ndarray
+        A ``uint8`` array of shape `(height, width, 3)` holding the RGB pixel
+        data to save.
+    file_ext : str
+        The file extension of the format the image should be saved as.
     n : int
         The zero-based counter for the image.
     """
-    numpy.random.seed(seed + n)
-    a = numpy.random.rand(height, width, 3) * 255
-    file_ext = SUPPORTED_IMAGE_FORMATS.get(image_format.lower(), 'png')
-    if file_ext == "jpg":
-        im_out = Image.fromarray(a.astype('uint8')).convert('RGB')
-    else:
-        im_out = Image.fromarray(a.astype('uint8')).convert('RGBA')
+    image_path = f'{combined_path}{n}.{file_ext}'
+    # Remove any existing file first instead of writing over it. The file may
+    # be a hard link created by ``_link_image``, and writing through it would
+    # change every other image sharing its data.
+    try:
+        os.remove(image_path)
+    except FileNotFoundError:
+        pass
+    if file_ext == "bmp":
+        # Bitmaps are uncompressed, so write the pixel data directly instead
+        # of converting through Pillow.
+        _write_bmp(image_path, a)
+        return
 
-    im_out.save('%s%d.%s' % (combined_path, n, file_ext))
+    im_out = Image.fromarray(a)
+    im_out.save(image_path, **SAVE_OPTIONS.get(file_ext, {}))
 
 
 def _main() -> NoReturn:
@@ -557,10 +1268,12 @@ def _main() -> NoReturn:
     args = _parse_args()
     if args.command == STANDARD_IMAGE:
         create_images(args.path, args.name, args.width, args.height,
-                      args.count, args.image_format, args.seed, args.size)
+                      args.count, args.image_format, args.seed, args.size,
+                      chunksize=args.chunksize, fast_synth=args.fast_synth,
+                      workers=args.workers, identical=args.identical)
     elif args.command == TFRECORD:
         create_tfrecords(args.source_path, args.dest_path, args.name,
-                         args.img_per_file)
+                         args.img_per_file, args.workers, args.compression)
     elif args.command == RECORDIO:
         create_recordio(args.source_path, args.dest_path, args.name,
-                        args.img_per_file)
+                        args.img_per_file, args.workers)
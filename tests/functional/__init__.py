@@ -0,0 +1,21 @@
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+
+# Dimensions and number of images generated by the functional tests. Small
+# images keep the suite fast while still exercising every code path. Set the
+# environment variables to run the tests at full size, such as 1920x1080.
+WIDTH = int(os.environ.get('IMAGINE_TEST_W', 256))
+HEIGHT = int(os.environ.get('IMAGINE_TEST_H', 144))
+COUNT = int(os.environ.get('IMAGINE_TEST_N', 100))
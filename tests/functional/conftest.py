@@ -0,0 +1,64 @@
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+from imagine import create_images
+from tests.functional import COUNT, HEIGHT, WIDTH
+
+
+# TensorFlow is an optional dependency, so TFRecord tests are skipped when it
+# isn't installed. The import is done once for the whole session.
+@pytest.fixture(scope='session')
+def tensorflow():
+    return pytest.importorskip('tensorflow')
+
+
+# MXNet is only used to check that RecordIO files can be read back, so those
+# checks are skipped when it isn't installed.
+@pytest.fixture(scope='session')
+def mxnet():
+    return pytest.importorskip('mxnet')
+
+
+# The record tests only read their input images, so a single set of images of
+# each format is created once and shared by every test in the session.
+@pytest.fixture(scope='session')
+def jpg_corpus(tmpdir_factory):
+    corpus = tmpdir_factory.mktemp('jpg_corpus')
+    create_images(
+        str(corpus),
+        'tmp_',
+        WIDTH,
+        HEIGHT,
+        COUNT,
+        'jpg',
+        0,
+        False
+    )
+    return str(corpus)
+
+
+@pytest.fixture(scope='session')
+def png_corpus(tmpdir_factory):
+    corpus = tmpdir_factory.mktemp('png_corpus')
+    create_images(
+        str(corpus),
+        'tmp_',
+        WIDTH,
+        HEIGHT,
+        COUNT,
+        'png',
+        0,
+        False
+    )
+    return str(corpus)
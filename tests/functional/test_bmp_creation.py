@@ -0,0 +1,82 @@
+# Copyright (c) 2020, NVIDIA CORPORATION. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+import re
+import os
+import numpy
+from glob import glob
+from imagine import create_images
+from tests.functional import COUNT, HEIGHT, WIDTH
+from PIL import Image
+
+
+class TestBMPCreation:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir):
+        self.tmpdir = tmpdir.mkdir('bmp_files')
+
+    def assert_pixels(self, image, width, height, seed):
+        # Each image holds the random data drawn for its counter
+        n = int(re.search(r'tmp_(\d+).bmp', image).group(1))
+        rng = numpy.random.default_rng(seed + n)
+        expected = rng.integers(0, 256, size=(height, width, 3),
+                                dtype=numpy.uint8)
+        with Image.open(image) as im:
+            assert im.size == (width, height)
+            assert (numpy.asarray(im) == expected).all()
+
+    def teardown_method(self):
+        for image in glob(f'{str(self.tmpdir)}/*'):
+            os.remove(image)
+        os.rmdir(str(self.tmpdir))
+
+    def test_creating_one_hundred_images(self):
+        create_images(
+            str(self.tmpdir),
+            'tmp_',
+            WIDTH,
+            HEIGHT,
+            COUNT,
+            'bmp',
+            0,
+            False
+        )
+
+        images = glob(f'{str(self.tmpdir)}/*')
+
+        assert len(images) == COUNT
+        for image in images:
+            assert re.search(r'tmp_\d+.bmp', image)
+            self.assert_pixels(image, WIDTH, HEIGHT, 0)
+
+    def test_creating_images_with_padded_rows(self):
+        # Rows of a bitmap are padded to a multiple of four bytes, which only
+        # happens when the width in bytes isn't already a multiple of four.
+        create_images(
+            str(self.tmpdir),
+            'tmp_',
+            1917,
+            HEIGHT,
+            10,
+            'bmp',
+            0,
+            False
+        )
+
+        images = glob(f'{str(self.tmpdir)}/*')
+
+        assert len(images) == 10
+        for image in images:
+            assert re.search(r'tmp_\d+.bmp', image)
+            self.assert_pixels(image, 1917, HEIGHT, 0)
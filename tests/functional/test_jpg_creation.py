@@ -16,6 +16,7 @@ import re
 import os
 from glob import glob
 from imagine import create_images
+from tests.functional import COUNT, HEIGHT, WIDTH
 from PIL import Image
 
 
@@ -33,9 +34,9 @@ class TestJPGCreation:
         create_images(
             str(self.tmpdir),
             'tmp_',
-            1920,
-            1080,
-            100,
+            WIDTH,
+            HEIGHT,
+            COUNT,
             'jpg',
             0,
             False
@@ -43,11 +44,11 @@ class TestJPGCreation:
 
         images = glob(f'{str(self.tmpdir)}/*')
 
-        assert len(images) == 100
+        assert len(images) == COUNT
         for image in images:
             assert re.search(r'tmp_\d+.jpg', image)
             with Image.open(image) as im:
-                assert im.size == (1920, 1080)
+                assert im.size == (WIDTH, HEIGHT)
 
     def test_creating_one_hundred_4K_images(self):
         create_images(
@@ -14,8 +14,10 @@
 import pytest
 import re
 import os
+import numpy
 from glob import glob
-from imagine import create_images
+from imagine import create_images, imagine
+from tests.functional import COUNT, HEIGHT, WIDTH
 from PIL import Image
 
 
@@ -33,9 +35,9 @@ class TestPNGCreation:
         create_images(
             str(self.tmpdir),
             'tmp_',
-            1920,
-            1080,
-            100,
+            WIDTH,
+            HEIGHT,
+            COUNT,
             'png',
             0,
             False
@@ -43,11 +45,11 @@ class TestPNGCreation:
 
         images = glob(f'{str(self.tmpdir)}/*')
 
-        assert len(images) == 100
+        assert len(images) == COUNT
         for image in images:
             assert re.search(r'tmp_\d+.png', image)
             with Image.open(image) as im:
-                assert im.size == (1920, 1080)
+                assert im.size == (WIDTH, HEIGHT)
 
     def test_creating_one_hundred_4K_images(self):
         create_images(
@@ -68,3 +70,94 @@ class TestPNGCreation:
             assert re.search(r'tmp_\d+.png', image)
             with Image.open(image) as im:
                 assert im.size == (3840, 2160)
+
+    def test_creating_one_hundred_synthetic_images(self):
+        create_images(
+            str(self.tmpdir),
+            'tmp_',
+            WIDTH,
+            HEIGHT,
+            COUNT,
+            'png',
+            0,
+            False,
+            fast_synth=True
+        )
+
+        images = glob(f'{str(self.tmpdir)}/*')
+
+        assert len(images) == COUNT
+        for image in images:
+            assert re.search(r'tmp_\d+.png', image)
+            with Image.open(image) as im:
+                assert im.size == (WIDTH, HEIGHT)
+
+    def test_creating_one_synthetic_image(self):
+        create_images(
+            str(self.tmpdir),
+            'tmp_',
+            WIDTH,
+            HEIGHT,
+            1,
+            'png',
+            0,
+            False,
+            fast_synth=True
+        )
+
+        with Image.open(os.path.join(str(self.tmpdir), 'tmp_0.png')) as im:
+            salt = numpy.asarray(im).reshape(-1)[:imagine.SYNTHETIC_SALT_SIZE]
+        # The salt of the first image must not cancel out the tile
+        assert salt.any()
+        # Settings from the in-process run aren't kept in the module
+        assert imagine._image_settings is None
+        assert imagine._synthetic_tile is None
+
+    def test_creating_one_hundred_identical_images(self):
+        create_images(
+            str(self.tmpdir),
+            'tmp_',
+            WIDTH,
+            HEIGHT,
+            COUNT,
+            'png',
+            0,
+            False,
+            identical=True
+        )
+
+        images = glob(f'{str(self.tmpdir)}/*')
+
+        assert len(images) == COUNT
+        with open(os.path.join(str(self.tmpdir), 'tmp_0.png'), 'rb') as f:
+            first_image = f.read()
+        for image in images:
+            assert re.search(r'tmp_\d+.png', image)
+            with open(image, 'rb') as f:
+                assert f.read() == first_image
+
+    def test_creating_images_over_identical_images(self):
+        # The linked files from the first run must not be written through
+        # when different images are created in their place.
+        for identical in (True, False):
+            create_images(
+                str(self.tmpdir),
+                'tmp_',
+                WIDTH,
+                HEIGHT,
+                COUNT,
+                'png',
+                0,
+                False,
+                identical=identical
+            )
+
+        images = glob(f'{str(self.tmpdir)}/*')
+
+        assert len(images) == COUNT
+        contents = set()
+        for image in images:
+            assert os.stat(image).st_nlink == 1
+            with open(image, 'rb') as f:
+                contents.add(f.read())
+        assert len(contents) == COUNT
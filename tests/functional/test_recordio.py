@@ -12,127 +12,139 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import pytest
-import re
 import os
-from glob import glob
+import shutil
+import struct
 from imagine import create_images, create_recordio
-from PIL import Image
+from math import ceil
+from tests.functional import COUNT
 
 
 class TestRecordIOCreation:
     @pytest.fixture(autouse=True)
     def setup(self, tmpdir):
-        self.tmpdir = tmpdir.mkdir('input_files')
         self.outdir = tmpdir.mkdir('output_files')
 
-    def teardown_method(self):
-        for image in glob(f'{str(self.tmpdir)}/*'):
-            os.remove(image)
-        for record in glob(f'{str(self.outdir)}/*'):
-            os.remove(record)
-        os.rmdir(str(self.tmpdir))
-        os.rmdir(str(self.outdir))
+    def read_record(self, record_file):
+        # Join the parts of a record, restoring the magic number which was
+        # removed from the data between each of them
+        payload = b''
+        while True:
+            magic, lrecord = struct.unpack('<II', record_file.read(8))
+            assert magic == 0xced7230a
+            cflag, length = lrecord >> 29, lrecord & ((1 << 29) - 1)
+            payload += record_file.read(length)
+            record_file.read(-length % 4)
+            if cflag in (0, 3):
+                return payload
+            payload += struct.pack('<I', magic)
 
-    def test_creating_recordio_from_100_jpgs(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'jpg',
-            0,
-            False
-        )
+    @pytest.mark.parametrize('image_format,img_per_file', [
+        ('jpg', COUNT),
+        ('png', COUNT),
+        ('jpg', max(1, COUNT // 10)),
+        ('png', max(1, COUNT // 10))
+    ])
+    def test_creating_recordio_from_images(self, request, image_format,
+                                           img_per_file):
+        corpus = request.getfixturevalue(f'{image_format}_corpus')
         create_recordio(
-            str(self.tmpdir),
+            corpus,
             str(self.outdir),
             'tmprecord_',
-            100
+            img_per_file
         )
 
-        records = glob(f'{str(self.outdir)}/*')
+        num_records = ceil(COUNT / img_per_file)
 
-        assert len(records) == 2
-        for record in records:
-            assert 'tmprecord_0.idx' in record or \
-                'tmprecord_0.rec' in record
+        # Each RecordIO file has a matching index file.
+        assert set(os.listdir(str(self.outdir))) == {
+            f'tmprecord_{num}.{ext}'
+            for num in range(num_records) for ext in ('idx', 'rec')
+        }
 
-    def test_creating_recordio_from_100_pngs(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'png',
-            0,
-            False
-        )
-        create_recordio(
-            str(self.tmpdir),
-            str(self.outdir),
-            'tmprecord_',
-            100
-        )
+        keys = []
+        for num in range(num_records):
+            record_path = os.path.join(str(self.outdir), f'tmprecord_{num}')
+            with open(f'{record_path}.idx') as idx_file, \
+                    open(f'{record_path}.rec', 'rb') as record_file:
+                for line in idx_file:
+                    key, position = map(int, line.split('\t'))
+                    record_file.seek(position)
+                    payload = self.read_record(record_file)
+                    # Each image is preceded by an IRHeader holding its id
+                    _, _, image_id, _ = struct.unpack('<IfQQ', payload[:24])
+                    assert image_id == key
+                    image = os.path.join(corpus, f'tmp_{key}.{image_format}')
+                    with open(image, 'rb') as image_file:
+                        assert payload[24:] == image_file.read()
+                    keys.append(key)
 
-        records = glob(f'{str(self.outdir)}/*')
+        assert sorted(keys) == list(range(COUNT))
 
-        assert len(records) == 2
-        for record in records:
-            assert 'tmprecord_0.idx' in record or \
-                'tmprecord_0.rec' in record
-
-    def test_creating_recordio_from_100_jpg_multiple_files(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'jpg',
-            0,
-            False
-        )
+    def test_creating_recordio_in_source_directory(self):
+        # Enough images that the directory is still being listed while the
+        # first records are written into it
+        create_images(str(self.outdir), 'tmp_', 8, 8, 3000, 'jpg', 0, False)
         create_recordio(
-            str(self.tmpdir),
+            str(self.outdir),
             str(self.outdir),
             'tmprecord_',
             10
         )
 
-        records = glob(f'{str(self.outdir)}/*')
-
-        assert len(records) == 20
+        records = [record for record in os.listdir(str(self.outdir))
+                   if record.startswith('tmprecord_')]
+        assert set(records) == {
+            f'tmprecord_{num}.{ext}'
+            for num in range(300) for ext in ('idx', 'rec')
+        }
+        entries = 0
         for record in records:
-            assert re.search(r'tmprecord_\d+.idx', record) or \
-                re.search(r'tmprecord_\d+.rec', record)
+            if record.endswith('.idx'):
+                with open(os.path.join(str(self.outdir), record)) as idx_file:
+                    entries += len(idx_file.readlines())
+        assert entries == 3000
 
-    def test_creating_recordio_from_100_pngs_multiple_files(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'png',
-            0,
-            False
-        )
+    def test_reading_recordio_with_mxnet(self, mxnet, jpg_corpus, tmpdir):
+        source = tmpdir.mkdir('source')
+        for image in os.listdir(jpg_corpus):
+            shutil.copy(os.path.join(jpg_corpus, image), str(source))
+        # The magic number at aligned offsets of the data splits the record
+        # into several parts
+        magic = struct.pack('<I', 0xced7230a)
+        source.join(f'tmp_{COUNT}.jpg').write(b'abcd' + magic + b'efgh' +
+                                              magic + magic + b'ij',
+                                              mode='wb')
+        img_per_file = max(1, COUNT // 10)
         create_recordio(
-            str(self.tmpdir),
+            str(source),
             str(self.outdir),
             'tmprecord_',
-            10
+            img_per_file
         )
 
-        records = glob(f'{str(self.outdir)}/*')
+        recordio = mxnet.recordio
+        keys = []
+        for num in range(ceil((COUNT + 1) / img_per_file)):
+            record_path = os.path.join(str(self.outdir), f'tmprecord_{num}')
+            expected_path = str(tmpdir.join(f'expected_{num}'))
+            reader = recordio.MXIndexedRecordIO(f'{record_path}.idx',
+                                                f'{record_path}.rec', 'r')
+            writer = recordio.MXIndexedRecordIO(f'{expected_path}.idx',
+                                                f'{expected_path}.rec', 'w')
+            for key in reader.keys:
+                header, image = recordio.unpack(reader.read_idx(key))
+                assert header.id == key
+                assert image == source.join(f'tmp_{key}.jpg').read_binary()
+                writer.write_idx(key, recordio.pack(header, image))
+                keys.append(key)
+            reader.close()
+            writer.close()
+            # Writing the same records with MXNet gives identical files
+            for ext in ('idx', 'rec'):
+                with open(f'{record_path}.{ext}', 'rb') as record_file, \
+                        open(f'{expected_path}.{ext}', 'rb') as expected_file:
+                    assert record_file.read() == expected_file.read()
 
-        assert len(records) == 20
-        for record in records:
-            assert re.search(r'tmprecord_\d+.idx', record) or \
-                re.search(r'tmprecord_\d+.rec', record)
+        assert sorted(keys) == list(range(COUNT + 1))
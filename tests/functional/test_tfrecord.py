@@ -12,121 +12,114 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import pytest
-import re
 import os
-from glob import glob
 from imagine import create_images, create_tfrecords
-from PIL import Image
+from math import ceil
+from tests.functional import COUNT
 
 
+@pytest.mark.usefixtures('tensorflow')
 class TestTFRecordCreation:
     @pytest.fixture(autouse=True)
     def setup(self, tmpdir):
-        self.tmpdir = tmpdir.mkdir('input_files')
         self.outdir = tmpdir.mkdir('output_files')
 
-    def teardown_method(self):
-        for image in glob(f'{str(self.tmpdir)}/*'):
-            os.remove(image)
-        for record in glob(f'{str(self.outdir)}/*'):
-            os.remove(record)
-        os.rmdir(str(self.tmpdir))
-        os.rmdir(str(self.outdir))
-
-    def test_creating_tfrecord_from_100_jpgs(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'jpg',
-            0,
-            False
-        )
+    @pytest.mark.parametrize('image_format,img_per_file', [
+        ('jpg', COUNT),
+        ('png', COUNT),
+        ('jpg', max(1, COUNT // 10)),
+        ('png', max(1, COUNT // 10))
+    ])
+    def test_creating_tfrecords_from_images(self, request, image_format,
+                                            img_per_file):
+        corpus = request.getfixturevalue(f'{image_format}_corpus')
         create_tfrecords(
-            str(self.tmpdir),
+            corpus,
             str(self.outdir),
             'tmprecord_',
-            100
+            img_per_file
         )
 
-        records = glob(f'{str(self.outdir)}/*')
-
-        assert len(records) == 1
-        assert 'tmprecord_0' in records[0]
-
-    def test_creating_tfrecord_from_100_pngs(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'png',
-            0,
-            False
-        )
+        num_records = ceil(COUNT / img_per_file)
+
+        assert set(os.listdir(str(self.outdir))) == {
+            f'tmprecord_{num}' for num in range(num_records)
+        }
+
+    def test_creating_gzip_tfrecords_from_100_jpgs(self, jpg_corpus):
         create_tfrecords(
-            str(self.tmpdir),
+            jpg_corpus,
             str(self.outdir),
             'tmprecord_',
-            100
+            10,
+            compression='gzip'
         )
 
-        records = glob(f'{str(self.outdir)}/*')
-
-        assert len(records) == 1
-        assert 'tmprecord_0' in records[0]
-
-    def test_creating_tfrecord_from_100_jpg_multiple_files(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'jpg',
-            0,
-            False
+        records = os.listdir(str(self.outdir))
+
+        assert set(records) == {
+            f'tmprecord_{num}' for num in range(ceil(COUNT / 10))
+        }
+        for record in records:
+            # Compressed records start with the gzip magic number
+            record_path = os.path.join(str(self.outdir), record)
+            with open(record_path, 'rb') as record_file:
+                assert record_file.read(2) == b'\x1f\x8b'
+
+    def test_creating_tfrecords_without_compression(self, jpg_corpus):
+        create_tfrecords(
+            jpg_corpus,
+            str(self.outdir),
+            'tmprecord_',
+            COUNT,
+            compression=None
         )
+
+        assert os.listdir(str(self.outdir)) == ['tmprecord_0']
+        record_path = os.path.join(str(self.outdir), 'tmprecord_0')
+        with open(record_path, 'rb') as record_file:
+            assert record_file.read(2) != b'\x1f\x8b'
+
+    def test_creating_tfrecords_in_source_directory(self):
+        # Enough images that the directory is still being listed while the
+        # first records are written into it
+        create_images(str(self.outdir), 'tmp_', 8, 8, 3000, 'jpg', 0, False)
         create_tfrecords(
-            str(self.tmpdir),
+            str(self.outdir),
             str(self.outdir),
             'tmprecord_',
             10
         )
 
-        records = glob(f'{str(self.outdir)}/*')
+        records = [record for record in os.listdir(str(self.outdir))
+                   if record.startswith('tmprecord_')]
+        assert set(records) == {f'tmprecord_{num}' for num in range(300)}
 
-        assert len(records) == 10
-        for record in records:
-            assert re.search(r'tmprecord_\d+', record)
-
-    def test_creating_tfrecord_from_100_pngs_multiple_files(self):
-        # Create sample images which will be used as a basis.
-        create_images(
-            str(self.tmpdir),
-            'tmp_',
-            1920,
-            1080,
-            100,
-            'png',
-            0,
-            False
-        )
+    def test_reading_tfrecords_from_jpgs(self, tensorflow, jpg_corpus):
         create_tfrecords(
-            str(self.tmpdir),
+            jpg_corpus,
             str(self.outdir),
             'tmprecord_',
             10
         )
 
-        records = glob(f'{str(self.outdir)}/*')
+        tf = tensorflow
+        features = {
+            'image/encoded': tf.io.FixedLenFeature([], tf.string),
+            'image/class/label': tf.io.FixedLenFeature([], tf.int64)
+        }
+        records = [os.path.join(str(self.outdir), record)
+                   for record in os.listdir(str(self.outdir))]
+        encoded = []
 
-        assert len(records) == 10
-        for record in records:
-            assert re.search(r'tmprecord_\d+', record)
+        for record in tf.data.TFRecordDataset(records):
+            example = tf.io.parse_single_example(record, features)
+            assert example['image/class/label'].numpy() == 0
+            encoded.append(example['image/encoded'].numpy())
+
+        images = []
+        for image in os.listdir(jpg_corpus):
+            with open(os.path.join(jpg_corpus, image), 'rb') as image_file:
+                images.append(image_file.read())
+
+        assert sorted(encoded) == sorted(images)
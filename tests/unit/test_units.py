@@ -37,20 +37,105 @@ class TestUnits:
                                                          'dne'))
 
     def test_record_slice_yields_expected_results(self):
-        slices = [range(x, x + 100) for x in range(0, 1000, 100)]
         results = imagine._record_slice(self.tmpdir,
                                         self.tmpdir,
                                         'test_record_',
                                         range(0, 1000),
-                                        100,
-                                        10)
-
-        for count, result in enumerate(results):
-            source, dest, name, images, num = result
-            assert source == self.tmpdir
-            assert dest == self.tmpdir
-            assert name == 'test_record_'
-            assert images == slices[count]
-            assert num == count
-        # Enumerate is 0-based, so the final number will be 9 for 10 records
-        assert count == 10 - 1
+                                        100)
+        expected = [(self.tmpdir, self.tmpdir, 'test_record_',
+                     list(range(num * 100, (num + 1) * 100)), num)
+                    for num in range(10)]
+
+        # Comparing lists also checks that exactly 10 records were yielded
+        assert list(results) == expected
+
+    def test_record_slice_includes_partial_final_record(self):
+        results = list(imagine._record_slice(self.tmpdir,
+                                             self.tmpdir,
+                                             'test_record_',
+                                             iter(range(0, 250)),
+                                             100))
+
+        assert [len(result[3]) for result in results] == [100, 100, 50]
+        assert [result[4] for result in results] == [0, 1, 2]
+
+    def test_image_index_parsed_from_filename(self):
+        assert imagine._image_index('tmp_0.jpg') == 0
+        assert imagine._image_index('tmp_123.png') == 123
+        # The trailing counter is used even if the prefix contains digits
+        assert imagine._image_index('image2_45.bmp') == 45
+        # Fall back to the first number when the name doesn't end with one
+        assert imagine._image_index('image7_final.jpg') == 7
+
+    def test_varint_encoding(self):
+        assert imagine._varint(0) == b'\x00'
+        assert imagine._varint(127) == b'\x7f'
+        assert imagine._varint(128) == b'\x80\x01'
+        assert imagine._varint(300) == b'\xac\x02'
+
+    def test_tfrecord_example_encoding(self):
+        # Features are written in a fixed order, image first then the label
+        expected = (b'\n6\n\x18\n\rimage/encoded\x12\x07\n\x05\n\x03jpg'
+                    b'\n\x1a\n\x11image/class/label\x12\x05\x1a\x03\n\x01'
+                    b'\x00')
+
+        assert imagine._tfrecord_example(b'jpg') == expected
+
+    def test_worker_count(self):
+        assert imagine._worker_count(3) == 3
+        # Non-positive and missing values fall back to the available CPUs
+        assert imagine._worker_count() >= 1
+        assert imagine._worker_count(0) == imagine._worker_count()
+
+    def test_recordio_record_encoding(self):
+        magic = b'\n#\xd7\xce'
+
+        assert imagine._recordio_record(b'abcde') == \
+            magic + b'\x05\x00\x00\x00' + b'abcde' + b'\x00\x00\x00'
+        # The magic number is removed from the data at aligned offsets and
+        # the record is split into flagged parts around it
+        assert imagine._recordio_record(b'abcd' + magic + b'ef') == \
+            magic + b'\x04\x00\x00\x20' + b'abcd' + \
+            magic + b'\x02\x00\x00\x60' + b'ef' + b'\x00\x00'
+
+    def test_recordio_record_too_large(self):
+        # The length would overflow into the continuation flag bits
+        with pytest.raises(ValueError):
+            imagine._recordio_record(bytes(imagine.RECORDIO_MAX_LENGTH))
+
+    def test_list_images_totals_sizes(self):
+        self.tmpdir.mkdir('subdir')
+        self.tmpdir.join('tmp_0.jpg').write(b'abc', mode='wb')
+        self.tmpdir.join('tmp_1.jpg').write(b'abcde', mode='wb')
+        sizes = {}
+
+        images = imagine._list_images(str(self.tmpdir), sizes)
+        # Sizes are only totalled as the listing is consumed
+        assert sizes == {}
+        assert sorted(images) == ['tmp_0.jpg', 'tmp_1.jpg']
+        assert sizes['first'] in (3, 5)
+        assert sizes['total'] == 8
+
+    def test_read_image_after_short_reads(self, monkeypatch):
+        image = self.tmpdir.join('tmp_0.jpg')
+        image.write(b'abcdefghij', mode='wb')
+        read = os.read
+        # Return at most three bytes per call like a network filesystem might
+        monkeypatch.setattr(os, 'read',
+                            lambda fd, size: read(fd, min(size, 3)))
+
+        assert imagine._read_image(str(image)) == b'abcdefghij'
+
+    def test_read_image_truncated(self, monkeypatch):
+        image = self.tmpdir.join('tmp_0.jpg')
+        image.write(b'abcdefghij', mode='wb')
+        fstat = os.fstat
+        # The file appears larger than the data which can be read from it
+        monkeypatch.setattr(os, 'fstat', lambda fd: os.stat_result(
+            fstat(fd)[:6] + (20,) + fstat(fd)[7:]))
+
+        with pytest.raises(OSError):
+            imagine._read_image(str(image))
+
+    def test_create_tfrecords_docstring(self):
+        assert "'gzip'" in imagine.create_tfrecords.__doc__